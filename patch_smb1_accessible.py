@@ -17,32 +17,74 @@ Game Genie codes:
 
 Usage:
     python patch_smb1_accessible.py "Super Mario Bros. (World).nes"
+    python patch_smb1_accessible.py "Super Mario Bros. (World).nes" --ips accessible.ips
+    python patch_smb1_accessible.py rom1.nes rom2.nes ...
 
 The patched ROM is written alongside the original with " - Accessible" appended to the name.
+With --ips, only the changed bytes are written, as an IPS patch, and no ROM is written.
 The original ROM is not modified.
 """
 
 import sys
 import os
+import argparse
+import collections
 import hashlib
+import mmap
+import shutil
+import struct
 
 
 GG_LETTERS = "APZLGITYEOXUKSVN"
+# bytes.translate table: ASCII byte of a letter -> its index (0-15), 0xFF if not a letter
+GG_TRANS = bytes(GG_LETTERS.find(chr(b)) & 0xFF if 0x41 <= b <= 0x5A else 0xFF for b in range(256))
 
+ROM_SIZE = 40976  # 16-byte iNES header + 32KB PRG + 8KB CHR
+INES_MAGIC = struct.unpack('<I', b'NES\x1a')[0]  # header magic as one 32-bit word
 
-def decode_game_genie(code):
-    """Decode a 6-letter NES Game Genie code into (cpu_address, value)."""
-    code = code.upper()
-    if len(code) != 6:
-        raise ValueError(f"Expected 6-letter code, got {len(code)}: {code}")
-    n = []
-    for ch in code:
-        idx = GG_LETTERS.find(ch)
-        if idx < 0:
-            raise ValueError(f"Invalid Game Genie letter '{ch}' in {code}")
-        n.append(idx)
-    address = (0x8000
-               | ((n[3] & 7) << 12)
+# MD5 of the headered "Super Mario Bros. (World).nes" dump the offsets target
+KNOWN_GOOD_MD5 = "811b027eaf99c2def7b933c5208636de"
+
+NOP_FILL = b'\xEA' * 256  # 6502 NOP, sliced to pad replacement code
+
+IPS_HEADER = b'PATCH'
+IPS_FOOTER = b'EOF'
+
+
+# Console output is collected here and written in one go by flush_log()
+_log_lines = []
+_quiet = False
+
+
+def set_quiet(quiet):
+    """Suppress (or restore) progress output. Errors and warnings are always shown."""
+    global _quiet
+    _quiet = quiet
+
+
+def log(line=""):
+    """Queue a line of console output."""
+    if not _quiet:
+        _log_lines.append(line)
+
+
+def log_error(line):
+    """Write an error or warning to stderr right away, ahead of the queued output."""
+    sys.stderr.write(line + "\n")
+    sys.stderr.flush()
+
+
+def flush_log():
+    """Write all queued output to stdout with a single write."""
+    if _log_lines:
+        sys.stdout.write("\n".join(_log_lines) + "\n")
+        sys.stdout.flush()
+        _log_lines.clear()
+
+
+def _gg_bits(n):
+    """Game Genie bit permutation: six letter indices -> (address & 0x7FFF) << 8 | value."""
+    address = (((n[3] & 7) << 12)
                | ((n[5] & 7) << 8)
                | ((n[4] & 8) << 8)
                | ((n[2] & 7) << 4)
@@ -50,7 +92,26 @@ def decode_game_genie(code):
                | (n[4] & 7)
                | (n[3] & 8))
     value = ((n[1] & 7) << 4) | ((n[0] & 8) << 4) | (n[0] & 7) | (n[5] & 8)
-    return address, value
+    return address << 8 | value
+
+
+# Each letter position feeds a fixed, disjoint set of bits, so precompute every
+# position's contribution for all 16 letters; decoding ORs six lookups together
+GG_POSITION_BITS = tuple(tuple(_gg_bits([x if i == pos else 0 for i in range(6)]) for x in range(16))
+                         for pos in range(6))
+
+
+def decode_game_genie(code):
+    """Decode a 6-letter NES Game Genie code into (cpu_address, value)."""
+    code = code.upper()
+    if len(code) != 6:
+        raise ValueError(f"Expected 6-letter code, got {len(code)}: {code}")
+    n = code.encode('ascii', 'replace').translate(GG_TRANS)
+    if 0xFF in n:
+        raise ValueError(f"Invalid Game Genie letter {code[n.index(0xFF)]!r} in {code}")
+    t0, t1, t2, t3, t4, t5 = GG_POSITION_BITS
+    bits = t0[n[0]] | t1[n[1]] | t2[n[2]] | t3[n[3]] | t4[n[4]] | t5[n[5]]
+    return 0x8000 | bits >> 8, bits & 0xFF
 
 
 def cpu_to_file(cpu_addr):
@@ -58,353 +119,573 @@ def cpu_to_file(cpu_addr):
     return cpu_addr - 0x8000 + 0x10
 
 
-def apply_game_genie(data, code, description):
-    """Decode and apply a Game Genie code to the ROM data."""
+def decode_gg_patch(code, description):
+    """Decode a Game Genie code into a (code, file_offset, value, log_before, log_after) entry.
+
+    Only the ROM's original byte in the log line is unknown until patch time,
+    so the text around it is formatted once here.
+    """
     cpu_addr, value = decode_game_genie(code)
     file_offset = cpu_to_file(cpu_addr)
-    old_byte = data[file_offset]
-    print(f"  {code}: CPU ${cpu_addr:04X} -> file ${file_offset:04X},"
-          f" ${old_byte:02X} -> ${value:02X}  ({description})")
-    data = data[:file_offset] + bytes([value]) + data[file_offset + 1:]
-    return data
+    log_before = f"  {code}: CPU ${cpu_addr:04X} -> file ${file_offset:04X}, $"
+    log_after = f" -> ${value:02X}  ({description})"
+    return code, file_offset, value, log_before, log_after
 
 
-def verify_rom(data):
-    """Verify this is a valid SMB1 NES ROM."""
-    if len(data) != 40976:
-        print(f"ERROR: Unexpected ROM size {len(data)} (expected 40976)")
+def apply_game_genie(data, gg_patch):
+    """Apply a decoded Game Genie entry (see decode_gg_patch) to the ROM data in place."""
+    code, file_offset, value, log_before, log_after = gg_patch
+    log(f"{log_before}{data[file_offset]:02X}{log_after}")
+    data[file_offset] = value
+
+
+def verify_rom(data, rom_name="ROM"):
+    """Verify this is a valid SMB1 NES ROM; rom_name labels any error."""
+    if len(data) != ROM_SIZE:
+        log_error(f"ERROR: {rom_name}: Unexpected ROM size {len(data)} (expected {ROM_SIZE})")
         return False
-    if data[:4] != b'NES\x1a':
-        print("ERROR: Not a valid iNES ROM (missing NES header)")
+    if struct.unpack_from('<I', data)[0] != INES_MAGIC:
+        log_error(f"ERROR: {rom_name}: Not a valid iNES ROM (missing NES header)")
         return False
     if data[4] != 2 or data[5] != 1:
-        print(f"ERROR: Unexpected bank count PRG={data[4]} CHR={data[5]} (expected 2,1)")
+        log_error(f"ERROR: {rom_name}: Unexpected bank count PRG={data[4]} CHR={data[5]} (expected 2,1)")
         return False
     return True
 
 
-def apply_patch(data, offset, old_byte, new_byte, description):
-    """Apply a single byte patch with verification."""
-    actual = data[offset]
-    if actual != old_byte:
-        print(f"  WARNING: At ${offset:04X}, expected ${old_byte:02X} but found ${actual:02X}")
-        print(f"  Skipping patch: {description}")
-        return data, False
-    data = data[:offset] + bytes([new_byte]) + data[offset + 1:]
-    print(f"  OK: ${offset:04X}: ${old_byte:02X} -> ${new_byte:02X}  ({description})")
-    return data, True
+class PatchMismatch(Exception):
+    """A patch's context bytes do not match the ROM, so the patch is skipped."""
+
+
+def check_patch(data, patch, trusted=False):
+    """Verify a PATCHES entry's context; raises PatchMismatch if it does not match.
+
+    trusted skips the context check; pass it only for the known-good ROM,
+    where every context is known to match.
+    """
+    title, context_offset, context, label, offset, new_bytes, ok_message = patch
+    log(f"--- {title} ---")
+    if not trusted:
+        verify_context(data, context_offset, context, label)
+    log(ok_message)
+
+
+def apply_patch(data, patch):
+    """Write a verified PATCHES entry's new bytes in place."""
+    data[patch.offset:patch.offset + len(patch.new_bytes)] = patch.new_bytes
+
+
+def diff_runs(original, patched):
+    """Return (offset, new_bytes) for each run of bytes where patched differs from original."""
+    runs = []
+    start = None
+    size = len(original)
+    for block in range(0, size, 256):
+        end = min(block + 256, size)
+        if original[block:end] == patched[block:end]:
+            if start is not None:
+                runs.append((start, bytes(patched[start:block])))
+                start = None
+            continue
+        for i in range(block, end):
+            if original[i] != patched[i]:
+                if start is None:
+                    start = i
+            elif start is not None:
+                runs.append((start, bytes(patched[start:i])))
+                start = None
+    if start is not None:
+        runs.append((start, bytes(patched[start:size])))
+    return runs
+
+
+def make_ips(runs):
+    """Encode (offset, new_bytes) runs as an IPS patch."""
+    out = [IPS_HEADER]
+    for offset, chunk in runs:
+        for pos in range(0, len(chunk), 0xFFFF):
+            piece = chunk[pos:pos + 0xFFFF]
+            out.append((offset + pos).to_bytes(3, 'big') + len(piece).to_bytes(2, 'big') + piece)
+    out.append(IPS_FOOTER)
+    return b''.join(out)
+
+
+def apply_ips(data, patch):
+    """Apply an IPS patch to a bytearray in place."""
+    if patch[:5] != IPS_HEADER:
+        raise ValueError("Not an IPS patch (missing PATCH header)")
+    pos = 5
+    while patch[pos:pos + 3] != IPS_FOOTER:
+        if pos + 5 > len(patch):
+            raise ValueError("Truncated IPS patch")
+        offset = int.from_bytes(patch[pos:pos + 3], 'big')
+        size = int.from_bytes(patch[pos + 3:pos + 5], 'big')
+        pos += 5
+        if size:
+            chunk = patch[pos:pos + size]
+            pos += size
+        else:
+            # RLE record: 2-byte repeat count, 1-byte fill value
+            count = int.from_bytes(patch[pos:pos + 2], 'big')
+            chunk = patch[pos + 2:pos + 3] * count
+            pos += 3
+            size = count
+        if len(chunk) != size or offset + size > len(data):
+            raise ValueError(f"Bad IPS record at patch offset {pos}")
+        data[offset:offset + size] = chunk
 
 
-def verify_context(data, offset, expected_bytes, label):
-    """Verify surrounding bytes match expected pattern."""
-    actual = data[offset:offset + len(expected_bytes)]
-    if actual != expected_bytes:
-        print(f"  Context check FAILED for {label}:")
-        print(f"    Expected: {expected_bytes.hex()}")
-        print(f"    Actual:   {actual.hex()}")
-        return False
-    return True
+def context_is_unique(data, context):
+    """Return True if context occurs exactly once in data (bytearray or mmap).
 
+    Uses the buffer's C-level find(); a second hit means the pattern no longer
+    pins down one location, e.g. because code moved in another ROM revision.
+    """
+    first = data.find(context)
+    return first >= 0 and data.find(context, first + 1) < 0
 
-def main():
-    print("=" * 60)
-    print("Super Mario Bros. - Accessibility Patch")
-    print("=" * 60)
-    print()
-
-    # Parse arguments
-    if len(sys.argv) != 2:
-        print(f"Usage: python {os.path.basename(sys.argv[0])} <rom_path>")
-        print()
-        print("Example:")
-        print(f'  python {os.path.basename(sys.argv[0])} "Super Mario Bros. (World).nes"')
-        sys.exit(1)
 
-    rom_path = sys.argv[1]
-    if not os.path.exists(rom_path):
-        print(f"ERROR: ROM not found at {rom_path}")
-        sys.exit(1)
+def verify_context(data, offset, expected_bytes, label):
+    """Verify surrounding bytes match expected pattern; raises PatchMismatch if not.
 
+    With a memoryview as data the comparison is done without copying the slice.
+    """
+    actual = data[offset:offset + len(expected_bytes)]
+    if actual != expected_bytes:
+        raise PatchMismatch(f"context check FAILED for {label}:\n"
+                            f"    Expected: {expected_bytes.hex()}\n"
+                            f"    Actual:   {actual.hex()}")
+
+
+# ================================================================
+# PATCH 1: Pit survival - early catch with upward boost
+# ================================================================
+# REPLACES the 6-byte death check ($3189) AND the 59-byte death routine ($318F)
+# with 65 bytes of new code ($3189-$31C9). ExitCtrl RTS at $31CA is untouched.
+# CloudExit at $B1BB ($31CB) is also untouched and used for coin heaven exits.
+#
+# When Mario is airborne (State!=0) and moving downward (Y_Speed>=0) in the
+# normal play area (HighPos==1) with Y position >= $C0, apply springboard
+# upward velocity with jump gravity. Checking Y_Speed instead of State==2
+# fixes the bug where jumping into a pit with A held keeps State==1 during
+# the downward arc, bypassing the old State==2 check entirely.
+#
+# Cloud/coin heaven areas (CloudTypeOverride != 0) are excluded — Mario must be
+# able to fall through the bottom to exit coin heaven. When HighPos >= 2 in a
+# cloud area, we JMP to the original CloudExit routine.
+#
+# During i-frames (InjuryTimer != 0), both vertical and horizontal velocity
+# are zeroed instead of boosting. This prevents clipping through bricks
+# (vertical from boost, horizontal from walking through pit walls) while
+# tile collision is disabled.
+#
+# CPU addresses (file offset = CPU - $8000 + $10):
+#   Code start:  CPU $B179 = file $3189
+#   boost:       CPU $B19F = file $31AF
+#   deep_fall:   CPU $B1A9 = file $31B9
+#   df_normal:   CPU $B1AE = file $31BE
+#   hold:        CPU $B1B5 = file $31C5
+#   ExitCtrl:    CPU $B1BA = file $31CA (original RTS, untouched)
+#   CloudExit:   CPU $B1BB = file $31CB (original routine, untouched)
+PIT_SURVIVAL_CONTEXT = bytes.fromhex("A5 B5 C9 02 30 3B A2 01")
+PIT_SURVIVAL_CODE = bytes.fromhex(
+    # --- Check HighPos ---
+    "A5 B5"                 # LDA Player_Y_HighPos
+    "C9 02"                 # CMP #$02
+    "B0 2A"                 # BCS deep_fall            (HighPos >= 2 -> $B1A9)
+    "AA"                    # TAX                      (X = HighPos; Z=1 if 0)
+    "F0 38"                 # BEQ ExitCtrl             (HighPos == 0 -> $B1BA)
+    # --- HighPos == 1 (normal play area): check if airborne ---
+    "A5 1D"                 # LDA Player_State
+    "F0 34"                 # BEQ ExitCtrl             (on ground -> $B1BA)
+    # --- Check if moving downward (not on upward arc of boost/jump) ---
+    "A5 9F"                 # LDA Player_Y_Speed
+    "30 30"                 # BMI ExitCtrl             (going up -> $B1BA)
+    # --- Cloud area bypass: don't catch falls in coin heaven ---
+    "AD 43 07"              # LDA CloudTypeOverride    ($0743)
+    "D0 2B"                 # BNE ExitCtrl             (cloud area -> $B1BA)
+    # --- Check if below ground threshold ---
+    "A5 CE"                 # LDA Player_Y_Position
+    "C9 C0"                 # CMP #$C0
+    "90 25"                 # BCC ExitCtrl             (above $C0 -> $B1BA)
+    # --- Zero sub-pixel before injury check (shared by boost and hold) ---
+    "A2 00"                 # LDX #$00                 (X=0 for STX ops)
+    "8E 33 04"              # STX Player_Y_MoveForce   ($0433, X=0)
+    # --- chk_injury: if i-frames active, hold instead of boost ---
+    "AD 9E 07"              # LDA InjuryTimer          ($079E)
+    "D0 16"                 # BNE hold                 (i-frames active -> $B1B5)
+    # --- boost: set velocity, fix gravity ---
+    "A9 F4"                 # LDA #$F4                 (springboard velocity)
+    "85 9F"                 # STA Player_Y_Speed
+    "A9 70"                 # LDA #$70                 (jump gravity)
+    "8D 0A 07"              # STA VerticalForceDown    ($070A)
+    "60"                    # RTS
+    # --- deep_fall: HighPos >= 2 ---
+    "AD 43 07"              # LDA CloudTypeOverride    ($0743)
+    "D0 0D"                 # BNE CloudExit            (cloud area -> $B1BB)
+    # --- df_normal: reset to play area, zero velocity, return ---
+    "85 9F"                 # STA Player_Y_Speed       (A=0, zero velocity)
+    "A9 01"                 # LDA #$01
+    "85 B5"                 # STA Player_Y_HighPos     (back to page 1)
+    "60"                    # RTS
+    # --- hold: i-frames active, freeze Mario in place ---
+    "86 9F"                 # STX Player_Y_Speed       (X=0, stop vertical)
+    "86 57"                 # STX Player_X_Speed       (X=0, stop horizontal)
+    "EA"                    # NOP (pad; falls through to ExitCtrl RTS)
+)
+# The whole $3189-$31C9 region, NOP-padded so no byte of the old routine survives
+PIT_SURVIVAL_PATCH = PIT_SURVIVAL_CODE + NOP_FILL[:65 - len(PIT_SURVIVAL_CODE)]
+assert len(PIT_SURVIVAL_PATCH) == 65
+
+# ================================================================
+# PATCH 2: Timer freeze - NOP the digit decrement
+# ================================================================
+# In RunGameTimer (CPU $B74F), the timer is decremented by storing $FF (-1)
+# into DigitModifier+5 at CPU $B78F: STA $0139 (bytes: $8D $39 $01)
+# NOP these 3 bytes so the timer digit modifier is never set, freezing the timer.
+# This does NOT affect DigitsMathRoutine (shared by scores/coins) — only the
+# timer's -1 input is removed. The timer display still refreshes harmlessly.
+# Context: LDA #$FF ($A9 $FF) before, JSR DigitsMathRoutine ($20 $5F $8F) after
+TIMER_FREEZE_CONTEXT = bytes.fromhex("A9 FF 8D 39 01 20 5F 8F")
+TIMER_FREEZE_CODE = NOP_FILL[:3]  # NOP NOP NOP over STA DigitModifier+5
+
+# ================================================================
+# PATCH 3: Springboard always gives max boost
+# ================================================================
+# In ChkForLandJumpSpring (CPU $DEC4), when Mario lands on the springboard,
+# JumpspringForce is initialized to $F9 (low bounce). The player must press A
+# with precise timing during the animation to upgrade it to $F4 (high bounce).
+# Change the default from $F9 to $F4 so the max boost always happens.
+# Context: LDA #$70, STA $0709, LDA #$F9, STA $06DB
+SPRINGBOARD_CONTEXT = bytes.fromhex("A9 70 8D 09 07 A9 F9 8D DB 06")
+SPRINGBOARD_CODE = bytes.fromhex("F4")  # LDA #$F9 -> LDA #$F4
+
+# ================================================================
+# PATCH 4: Castle maze auto-correct
+# ================================================================
+# In ProcLoopCommand (CPU $C0CC), castle levels 4-4, 7-4, 8-4 check if Mario
+# is at the correct Y-position at certain page boundaries. Wrong position loops
+# the level back, creating a maze puzzle. This is inaccessible for cognitively
+# impaired players, AND simply disabling the loop causes soft-locks (dead-end paths).
+#
+# Fix: load the correct Y from the table. If the value is safe (< $C0), teleport
+# Mario there and set him on-ground. If the value is dangerous (>= $C0, i.e. 8-4's
+# $F0 entries which are below the floor), skip the teleport entirely — the maze check
+# still passes (no loopback), but Mario stays at his natural position.
+#
+# This works because all 4-4/7-4 table values ($40/$80/$B0) are < $C0 and land in
+# open corridors, while all 8-4 values ($F0) are >= $C0. For 8-4, our pit fill
+# patches ensure all terrain is walkable, so Mario can proceed from any position.
+#
+# Original 13 bytes at CPU $C0EB (file $40FB):
+#   A5 CE       LDA Player_Y_Position
+#   D9 81 C0    CMP $C081,Y           (required Y from table)
+#   D0 23       BNE WrongChk
+#   A5 1D       LDA Player_State
+#   C9 00       CMP #$00
+#   D0 1D       BNE WrongChk
+#
+# New 13 bytes:
+#   B9 81 C0    LDA $C081,Y           (load correct Y from table)
+#   C9 C0       CMP #$C0              (is it at/below floor level?)
+#   B0 06       BCS $C0F8             (>= $C0: skip teleport, fall through to pass)
+#   85 CE       STA Player_Y_Position (teleport Mario to correct path)
+#   A9 00       LDA #$00
+#   85 1D       STA Player_State      (set to on-ground)
+MAZE_ORIGINAL = bytes.fromhex("A5 CE D9 81 C0 D0 23 A5 1D C9 00 D0 1D")
+MAZE_CODE = bytes.fromhex(
+    "B9 81 C0"          # LDA $C081,Y  (correct Y from table)
+    "C9 C0"             # CMP #$C0     (at/below floor level?)
+    "B0 06"             # BCS +6       (>= $C0: skip teleport -> $C0F8)
+    "85 CE"             # STA Player_Y_Position (teleport)
+    "A9 00"             # LDA #$00
+    "85 1D"             # STA Player_State (on ground)
+)
+
+# ================================================================
+# PATCH 5: Skip title screen
+# ================================================================
+# TitleScreenMode runs 4 tasks in sequence via OperMode_Task:
+#   0: InitializeGame   - clears RAM, sets up level data
+#   1: ScreenRoutines   - renders title screen across ~15 frames
+#   2: PrimaryGameSetup - sets lives, player size, enables screen
+#   3: GameMenuRoutine  - waits for Start button, runs demo if idle
+#
+# GameMenuRoutine (CPU $8245, file $0255) reads joypad and waits for
+# Start. When pressed, it jumps to StartWorld1 (CPU $82E3) which sets
+# OperMode=1 (GameMode) and begins play.
+#
+# Patch: replace the first 3 bytes of GameMenuRoutine with JMP StartWorld1.
+# StartWorld1 is at CPU $82E6 — NOT $82E3 which is inside ChkContinue's
+# continue-game path (LDA ContinueWorld / JSR GoContinue). The BCC at
+# $82DE that skips the continue path targets $82E6, confirming the address.
+# Tasks 0-2 still run their full initialization; the title screen briefly
+# flashes while ScreenRoutines renders, then gameplay starts automatically.
+# Continue (A+Start) and player select are skipped — always 1-player from 1-1.
+# After game over, the cycle repeats and auto-starts a new game.
+#
+# Context: A0 00 AD FC 06 0D FD 06
+#   LDY #$00, LDA SavedJoypad1Bits, ORA SavedJoypad2Bits
+TITLE_SKIP_CONTEXT = bytes.fromhex("A0 00 AD FC 06 0D FD 06")
+TITLE_SKIP_CODE = bytes.fromhex("4C E6 82")  # JMP StartWorld1
+
+# Each patch: the context bytes expected at context_offset (label names them
+# in failure messages) are verified first; new_bytes are then written at
+# offset, and ok_message is logged.
+Patch = collections.namedtuple(
+    "Patch", "title context_offset context label offset new_bytes ok_message")
+
+PATCHES = [
+    Patch("Patch 1: Pit survival (early Y-floor with upward boost)",
+          0x3189, PIT_SURVIVAL_CONTEXT, "PlayerHole: LDA HighPos, CMP #$02, BMI ExitCtrl, LDX #$01",
+          0x3189, PIT_SURVIVAL_PATCH,
+          f"  OK: $3189-$31C9: pit survival with cloud area bypass ({len(PIT_SURVIVAL_CODE)} bytes)"),
+    Patch("Patch 2: Timer freeze (NOP digit decrement)",
+          0x379D, TIMER_FREEZE_CONTEXT, "RunGameTimer: LDA #$FF, STA DigitModifier+5, JSR DigitsMathRoutine",
+          0x379F, TIMER_FREEZE_CODE,
+          "  OK: $379F-$37A1: $8D $39 $01 -> $EA $EA $EA  (STA DigitModifier+5 -> NOP NOP NOP)"),
+    Patch("Patch 3: Springboard always max boost",
+          0x5ED9, SPRINGBOARD_CONTEXT, "ChkForLandJumpSpring: LDA #$70, STA VerticalForce, LDA #$F9, STA JumpspringForce",
+          0x5EDF, SPRINGBOARD_CODE,
+          "  OK: $5EDF: $F9 -> $F4  (JumpspringForce default: $F9 (low bounce) -> $F4 (always max bounce))"),
+    Patch("Patch 4: Castle maze auto-correct",
+          0x40FB, MAZE_ORIGINAL, "ProcLoopCommand: Y-position check + Player_State check",
+          0x40FB, MAZE_CODE,
+          "  OK: $40FB-$4107: maze auto-correct with conditional teleport\n"
+          "       4-4/7-4: teleport to correct path  |  8-4: pass check, no teleport"),
+    Patch("Patch 5: Skip title screen",
+          0x0255, TITLE_SKIP_CONTEXT, "GameMenuRoutine: LDY #$00, LDA SavedJoypad1Bits, ORA SavedJoypad2Bits",
+          0x0255, TITLE_SKIP_CODE,
+          "  OK: $0255-$0257: $A0 $00 $AD -> $4C $E6 $82  (JMP StartWorld1)"),
+]
+
+GG_CODES = [
+    ("POAISA", "Power up on enemies"),
+    ("OZTLLX", "Always stay big (1/3)"),
+    ("AATLGZ", "Always stay big (2/3)"),
+    ("SZLIVO", "Always stay big (3/3)"),
+]
+# The codes are fixed, so decode them (and map to file offsets) once at import
+GG_PATCHES = [decode_gg_patch(code, description) for code, description in GG_CODES]
+
+
+def patch_rom(data, hash_rom=True, rom_name="ROM"):
+    """Verify and patch a ROM buffer (bytearray or writable mmap) in place.
+
+    hash_rom=False skips the input MD5; every patch then gets its context check.
+    rom_name labels the warnings and errors, which go to stderr.
+
+    Returns (patches_applied, patches_failed, gg_applied), or None if the
+    buffer is not a supported SMB1 ROM. Progress is queued with log(); call
+    flush_log() to print it.
+    """
+    # Hash, verify and patch through one memoryview, so nothing is copied out
+    # of the backing buffer. The with-block releases it, which an mmap needs
+    # before it can be closed.
+    with memoryview(data) as view:
+        log(f"Loaded ROM: {len(view)} bytes")
+        md5 = hashlib.md5(view).hexdigest() if hash_rom else None
+        trusted = md5 == KNOWN_GOOD_MD5
+        if trusted:
+            log(f"MD5: {md5} (Super Mario Bros. (World), known good; context checks skipped)")
+        elif md5:
+            log(f"MD5: {md5} (unrecognized dump; relying on context checks)")
+        else:
+            log("MD5: not computed (--no-hash); relying on context checks")
+        log()
+
+        if not verify_rom(view, rom_name):
+            return None
+
+        # Phase 1: check every context against the untouched ROM, so no
+        # check can be thrown off by another patch's writes
+        verified = []
+        for patch in PATCHES:
+            try:
+                check_patch(view, patch, trusted)
+            except PatchMismatch as e:
+                log("  Context check FAILED; patch skipped")
+                log_error(f"WARNING: {rom_name}: Skipping {patch.title}: {e}")
+            else:
+                verified.append(patch)
+                if not trusted and not context_is_unique(data, patch.context):
+                    log_error(f"WARNING: {rom_name}: {patch.title}: context bytes also occur"
+                              " elsewhere in the ROM; check the offsets for this revision")
+            log()
+        patches_applied = len(verified)
+        patches_failed = len(PATCHES) - patches_applied
+
+        # Phase 2: write the verified patches in file order
+        for patch in sorted(verified, key=lambda patch: patch.offset):
+            apply_patch(view, patch)
+
+        log("--- Game Genie codes ---")
+        for gg_patch in GG_PATCHES:
+            apply_game_genie(view, gg_patch)
+        gg_applied = len(GG_PATCHES)
+    log(f"  Applied {gg_applied} Game Genie codes")
+
+    return patches_applied, patches_failed, gg_applied
+
+
+def patch_file(rom_path, ips_path=None, hash_rom=True, hash_output=False):
+    """Patch one ROM file.
+
+    Writes "<name> - Accessible<ext>" next to the ROM, or only an IPS patch to
+    ips_path. Returns True on success; problems are reported with log_error().
+    """
     # Build output path: insert " - Accessible" before extension
     base, ext = os.path.splitext(rom_path)
     output_path = f"{base} - Accessible{ext}"
+    output_name = os.path.basename(ips_path or output_path)
 
-    # Read ROM
-    with open(rom_path, 'rb') as f:
-        data = f.read()
-
-    print(f"Loaded ROM: {len(data)} bytes")
-    md5 = hashlib.md5(data).hexdigest()
-    print(f"MD5: {md5}")
-    print()
-
-    if not verify_rom(data):
-        sys.exit(1)
-
-    patches_applied = 0
-    patches_failed = 0
+    try:
+        rom_size = os.path.getsize(rom_path)
+    except FileNotFoundError:
+        log_error(f"ERROR: ROM not found at {rom_path}. {output_name} was not written.")
+        return False
 
-    # ================================================================
-    # PATCH 1: Pit survival - early catch with upward boost
-    # ================================================================
-    print("--- Patch 1: Pit survival (early Y-floor with upward boost) ---")
-    # REPLACES the 6-byte death check ($3189) AND the 59-byte death routine ($318F)
-    # with 65 bytes of new code ($3189-$31C9). ExitCtrl RTS at $31CA is untouched.
-    # CloudExit at $B1BB ($31CB) is also untouched and used for coin heaven exits.
-    #
-    # When Mario is airborne (State!=0) and moving downward (Y_Speed>=0) in the
-    # normal play area (HighPos==1) with Y position >= $C0, apply springboard
-    # upward velocity with jump gravity. Checking Y_Speed instead of State==2
-    # fixes the bug where jumping into a pit with A held keeps State==1 during
-    # the downward arc, bypassing the old State==2 check entirely.
-    #
-    # Cloud/coin heaven areas (CloudTypeOverride != 0) are excluded — Mario must be
-    # able to fall through the bottom to exit coin heaven. When HighPos >= 2 in a
-    # cloud area, we JMP to the original CloudExit routine.
-    #
-    # During i-frames (InjuryTimer != 0), both vertical and horizontal velocity
-    # are zeroed instead of boosting. This prevents clipping through bricks
-    # (vertical from boost, horizontal from walking through pit walls) while
-    # tile collision is disabled.
-    #
-    # CPU addresses (file offset = CPU - $8000 + $10):
-    #   Code start:  CPU $B179 = file $3189
-    #   boost:       CPU $B19F = file $31AF
-    #   deep_fall:   CPU $B1A9 = file $31B9
-    #   df_normal:   CPU $B1AE = file $31BE
-    #   hold:        CPU $B1B5 = file $31C5
-    #   ExitCtrl:    CPU $B1BA = file $31CA (original RTS, untouched)
-    #   CloudExit:   CPU $B1BB = file $31CB (original routine, untouched)
-    if verify_context(data, 0x3189, bytes([0xA5, 0xB5, 0xC9, 0x02, 0x30, 0x3B, 0xA2, 0x01]),
-                       "PlayerHole: LDA HighPos, CMP #$02, BMI ExitCtrl, LDX #$01"):
-        new_code = bytes([
-            # --- Check HighPos ---
-            0xA5, 0xB5,             # LDA Player_Y_HighPos
-            0xC9, 0x02,             # CMP #$02
-            0xB0, 0x2A,             # BCS deep_fall            (HighPos >= 2 -> $B1A9)
-            0xAA,                   # TAX                      (X = HighPos; Z=1 if 0)
-            0xF0, 0x38,             # BEQ ExitCtrl             (HighPos == 0 -> $B1BA)
-            # --- HighPos == 1 (normal play area): check if airborne ---
-            0xA5, 0x1D,             # LDA Player_State
-            0xF0, 0x34,             # BEQ ExitCtrl             (on ground -> $B1BA)
-            # --- Check if moving downward (not on upward arc of boost/jump) ---
-            0xA5, 0x9F,             # LDA Player_Y_Speed
-            0x30, 0x30,             # BMI ExitCtrl             (going up -> $B1BA)
-            # --- Cloud area bypass: don't catch falls in coin heaven ---
-            0xAD, 0x43, 0x07,       # LDA CloudTypeOverride    ($0743)
-            0xD0, 0x2B,             # BNE ExitCtrl             (cloud area -> $B1BA)
-            # --- Check if below ground threshold ---
-            0xA5, 0xCE,             # LDA Player_Y_Position
-            0xC9, 0xC0,             # CMP #$C0
-            0x90, 0x25,             # BCC ExitCtrl             (above $C0 -> $B1BA)
-            # --- Zero sub-pixel before injury check (shared by boost and hold) ---
-            0xA2, 0x00,             # LDX #$00                 (X=0 for STX ops)
-            0x8E, 0x33, 0x04,       # STX Player_Y_MoveForce   ($0433, X=0)
-            # --- chk_injury: if i-frames active, hold instead of boost ---
-            0xAD, 0x9E, 0x07,       # LDA InjuryTimer          ($079E)
-            0xD0, 0x16,             # BNE hold                 (i-frames active -> $B1B5)
-            # --- boost: set velocity, fix gravity ---
-            0xA9, 0xF4,             # LDA #$F4                 (springboard velocity)
-            0x85, 0x9F,             # STA Player_Y_Speed
-            0xA9, 0x70,             # LDA #$70                 (jump gravity)
-            0x8D, 0x0A, 0x07,       # STA VerticalForceDown    ($070A)
-            0x60,                   # RTS
-            # --- deep_fall: HighPos >= 2 ---
-            0xAD, 0x43, 0x07,       # LDA CloudTypeOverride    ($0743)
-            0xD0, 0x0D,             # BNE CloudExit            (cloud area -> $B1BB)
-            # --- df_normal: reset to play area, zero velocity, return ---
-            0x85, 0x9F,             # STA Player_Y_Speed       (A=0, zero velocity)
-            0xA9, 0x01,             # LDA #$01
-            0x85, 0xB5,             # STA Player_Y_HighPos     (back to page 1)
-            0x60,                   # RTS
-            # --- hold: i-frames active, freeze Mario in place ---
-            0x86, 0x9F,             # STX Player_Y_Speed       (X=0, stop vertical)
-            0x86, 0x57,             # STX Player_X_Speed       (X=0, stop horizontal)
-            0xEA,                   # NOP (pad; falls through to ExitCtrl RTS)
-        ])
-        nop_fill = bytes([0xEA] * (65 - len(new_code)))
-        data = data[:0x3189] + new_code + nop_fill + data[0x31CA:]
-        print(f"  OK: $3189-$31C9: pit survival with cloud area bypass ({len(new_code)} bytes)")
-        patches_applied += 1
+    if ips_path:
+        # Patch an in-memory copy; the IPS records are diffed against the
+        # original file. Read straight into a buffer of the known size rather
+        # than building a bytes object and copying it into a bytearray.
+        data = bytearray(rom_size)
+        with open(rom_path, 'rb') as f:
+            read = f.readinto(data)
+        del data[read:]  # only if the file shrank since getsize()
+        result = patch_rom(data, hash_rom=hash_rom, rom_name=rom_path)
+        new_md5 = hashlib.md5(data).hexdigest() if hash_output else None
     else:
-        patches_failed += 1
+        # Patch a copy of the ROM in place through a writable memory map, so the
+        # ROM is never read into or written back from a Python buffer. copyfile
+        # uses the OS fast path (copy_file_range/reflink) where available. The
+        # copy is a temporary file next to the output, moved over it only on
+        # success, so a failed run never clobbers an earlier patched ROM.
+        if rom_size == 0:
+            log_error(f"ERROR: {rom_path}: ROM file is empty")
+            return False
+        temp_path = f"{output_path}.{os.getpid()}.tmp"
+        shutil.copyfile(rom_path, temp_path)
+        try:
+            with open(temp_path, 'r+b') as f, mmap.mmap(f.fileno(), 0) as data:
+                result = patch_rom(data, hash_rom=hash_rom, rom_name=rom_path)
+                new_md5 = hashlib.md5(data).hexdigest() if hash_output else None
+                data.flush()
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    if result is None:
+        if not ips_path:
+            os.remove(temp_path)
+        return False
+    patches_applied, patches_failed, gg_applied = result
 
     # ================================================================
-    # PATCH 2: Timer freeze - NOP the digit decrement
+    # Summary and write IPS patch
     # ================================================================
-    print()
-    print("--- Patch 2: Timer freeze (NOP digit decrement) ---")
-    # In RunGameTimer (CPU $B74F), the timer is decremented by storing $FF (-1)
-    # into DigitModifier+5 at CPU $B78F: STA $0139 (bytes: $8D $39 $01)
-    # NOP these 3 bytes so the timer digit modifier is never set, freezing the timer.
-    # This does NOT affect DigitsMathRoutine (shared by scores/coins) — only the
-    # timer's -1 input is removed. The timer display still refreshes harmlessly.
-    # Context: LDA #$FF ($A9 $FF) before, JSR DigitsMathRoutine ($20 $5F $8F) after
-    if verify_context(data, 0x379D, bytes([0xA9, 0xFF, 0x8D, 0x39, 0x01, 0x20, 0x5F, 0x8F]),
-                       "RunGameTimer: LDA #$FF, STA DigitModifier+5, JSR DigitsMathRoutine"):
-        data = data[:0x379F] + bytes([0xEA, 0xEA, 0xEA]) + data[0x37A2:]
-        print(f"  OK: $379F-$37A1: $8D $39 $01 -> $EA $EA $EA  (STA DigitModifier+5 -> NOP NOP NOP)")
-        patches_applied += 1
-    else:
-        patches_failed += 1
+    log()
+    log("=" * 60)
+    log(f"Patches applied: {patches_applied}/{len(PATCHES)}")
+    log(f"Patches failed:  {patches_failed}/{len(PATCHES)}")
+    log(f"Game Genie codes: {gg_applied}/{len(GG_CODES)}")
 
-    # ================================================================
-    # PATCH 3: Springboard always gives max boost
-    # ================================================================
-    print()
-    print("--- Patch 3: Springboard always max boost ---")
-    # In ChkForLandJumpSpring (CPU $DEC4), when Mario lands on the springboard,
-    # JumpspringForce is initialized to $F9 (low bounce). The player must press A
-    # with precise timing during the animation to upgrade it to $F4 (high bounce).
-    # Change the default from $F9 to $F4 so the max boost always happens.
-    # Context: LDA #$70, STA $0709, LDA #$F9, STA $06DB
-    if verify_context(data, 0x5ED9, bytes([0xA9, 0x70, 0x8D, 0x09, 0x07, 0xA9, 0xF9, 0x8D, 0xDB, 0x06]),
-                       "ChkForLandJumpSpring: LDA #$70, STA VerticalForce, LDA #$F9, STA JumpspringForce"):
-        data, ok = apply_patch(data, 0x5EDF, 0xF9, 0xF4,
-                               "JumpspringForce default: $F9 (low bounce) -> $F4 (always max bounce)")
-        if ok:
-            patches_applied += 1
-        else:
-            patches_failed += 1
-    else:
-        patches_failed += 1
+    if patches_applied == 0:
+        log_error(f"ERROR: {rom_path}: No patches were applied! ROM may be incompatible. {output_name} was not written.")
+        if not ips_path:
+            os.remove(temp_path)
+        return False
 
-    # ================================================================
-    # PATCH 4: Castle maze auto-correct
-    # ================================================================
-    print()
-    print("--- Patch 4: Castle maze auto-correct ---")
-    # In ProcLoopCommand (CPU $C0CC), castle levels 4-4, 7-4, 8-4 check if Mario
-    # is at the correct Y-position at certain page boundaries. Wrong position loops
-    # the level back, creating a maze puzzle. This is inaccessible for cognitively
-    # impaired players, AND simply disabling the loop causes soft-locks (dead-end paths).
-    #
-    # Fix: load the correct Y from the table. If the value is safe (< $C0), teleport
-    # Mario there and set him on-ground. If the value is dangerous (>= $C0, i.e. 8-4's
-    # $F0 entries which are below the floor), skip the teleport entirely — the maze check
-    # still passes (no loopback), but Mario stays at his natural position.
-    #
-    # This works because all 4-4/7-4 table values ($40/$80/$B0) are < $C0 and land in
-    # open corridors, while all 8-4 values ($F0) are >= $C0. For 8-4, our pit fill
-    # patches ensure all terrain is walkable, so Mario can proceed from any position.
-    #
-    # Original 13 bytes at CPU $C0EB (file $40FB):
-    #   A5 CE       LDA Player_Y_Position
-    #   D9 81 C0    CMP $C081,Y           (required Y from table)
-    #   D0 23       BNE WrongChk
-    #   A5 1D       LDA Player_State
-    #   C9 00       CMP #$00
-    #   D0 1D       BNE WrongChk
-    #
-    # New 13 bytes:
-    #   B9 81 C0    LDA $C081,Y           (load correct Y from table)
-    #   C9 C0       CMP #$C0              (is it at/below floor level?)
-    #   B0 06       BCS $C0F8             (>= $C0: skip teleport, fall through to pass)
-    #   85 CE       STA Player_Y_Position (teleport Mario to correct path)
-    #   A9 00       LDA #$00
-    #   85 1D       STA Player_State      (set to on-ground)
-    original = bytes([0xA5, 0xCE, 0xD9, 0x81, 0xC0, 0xD0, 0x23,
-                      0xA5, 0x1D, 0xC9, 0x00, 0xD0, 0x1D])
-    if verify_context(data, 0x40FB, original,
-                       "ProcLoopCommand: Y-position check + Player_State check"):
-        new_code = bytes([
-            0xB9, 0x81, 0xC0,   # LDA $C081,Y  (correct Y from table)
-            0xC9, 0xC0,         # CMP #$C0     (at/below floor level?)
-            0xB0, 0x06,         # BCS +6       (>= $C0: skip teleport -> $C0F8)
-            0x85, 0xCE,         # STA Player_Y_Position (teleport)
-            0xA9, 0x00,         # LDA #$00
-            0x85, 0x1D,         # STA Player_State (on ground)
-        ])
-        data = data[:0x40FB] + new_code + data[0x4108:]
-        print(f"  OK: $40FB-$4107: maze auto-correct with conditional teleport")
-        print(f"       4-4/7-4: teleport to correct path  |  8-4: pass check, no teleport")
-        patches_applied += 1
+    if patches_failed > 0:
+        log_error(f"WARNING: {rom_path}: {patches_failed} patch(es) failed. ROM may be partially patched.")
+
+    if ips_path:
+        with open(rom_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as original_rom:
+            runs = diff_runs(original_rom, data)
+        ips = make_ips(runs)
+        with open(ips_path, 'wb') as f:
+            f.write(ips)
     else:
-        patches_failed += 1
+        os.replace(temp_path, output_path)
 
-    # ================================================================
-    # PATCH 5: Skip title screen
-    # ================================================================
-    print()
-    print("--- Patch 5: Skip title screen ---")
-    # TitleScreenMode runs 4 tasks in sequence via OperMode_Task:
-    #   0: InitializeGame   - clears RAM, sets up level data
-    #   1: ScreenRoutines   - renders title screen across ~15 frames
-    #   2: PrimaryGameSetup - sets lives, player size, enables screen
-    #   3: GameMenuRoutine  - waits for Start button, runs demo if idle
-    #
-    # GameMenuRoutine (CPU $8245, file $0255) reads joypad and waits for
-    # Start. When pressed, it jumps to StartWorld1 (CPU $82E3) which sets
-    # OperMode=1 (GameMode) and begins play.
-    #
-    # Patch: replace the first 3 bytes of GameMenuRoutine with JMP StartWorld1.
-    # StartWorld1 is at CPU $82E6 — NOT $82E3 which is inside ChkContinue's
-    # continue-game path (LDA ContinueWorld / JSR GoContinue). The BCC at
-    # $82DE that skips the continue path targets $82E6, confirming the address.
-    # Tasks 0-2 still run their full initialization; the title screen briefly
-    # flashes while ScreenRoutines renders, then gameplay starts automatically.
-    # Continue (A+Start) and player select are skipped — always 1-player from 1-1.
-    # After game over, the cycle repeats and auto-starts a new game.
-    #
-    # Context: A0 00 AD FC 06 0D FD 06
-    #   LDY #$00, LDA SavedJoypad1Bits, ORA SavedJoypad2Bits
-    if verify_context(data, 0x0255, bytes([0xA0, 0x00, 0xAD, 0xFC, 0x06, 0x0D, 0xFD, 0x06]),
-                       "GameMenuRoutine: LDY #$00, LDA SavedJoypad1Bits, ORA SavedJoypad2Bits"):
-        data = data[:0x0255] + bytes([0x4C, 0xE6, 0x82]) + data[0x0258:]
-        print(f"  OK: $0255-$0257: $A0 $00 $AD -> $4C $E6 $82  (JMP StartWorld1)")
-        patches_applied += 1
+    log()
+    log(f"Original ROM: {os.path.basename(rom_path)}")
+    if ips_path:
+        log(f"IPS patch:    {output_name} ({len(ips)} bytes, {len(runs)} changed runs)")
+    else:
+        log(f"Patched ROM:  {output_name}")
+    if new_md5:
+        log(f"New MD5: {new_md5}")
+    log()
+    log("What was changed:")
+    log("  - Pits are survivable (Mario bounces out with springboard velocity)")
+    log("  - Timer is frozen (no time pressure)")
+    log("  - Springboard always gives max boost (no precise timing needed)")
+    log("  - Castle mazes auto-corrected (Mario teleported to correct path in 4-4, 7-4, 8-4)")
+    log("  - Title screen skipped (gameplay starts automatically)")
+    log("  - Touching enemies powers you up (POAISA)")
+    log("  - Mario always stays big (OZTLLX + AATLGZ + SZLIVO)")
+    log()
+    if ips_path:
+        log("Done! Apply the IPS patch to the original ROM in any IPS patcher or emulator.")
     else:
-        patches_failed += 1
+        log("Done! The patched ROM is ready to play.")
+    return True
 
-    # ================================================================
-    # GAME GENIE CODES
-    # ================================================================
-    print()
-    print("--- Game Genie codes ---")
-    data = apply_game_genie(data, "POAISA", "Power up on enemies")
-    data = apply_game_genie(data, "OZTLLX", "Always stay big (1/3)")
-    data = apply_game_genie(data, "AATLGZ", "Always stay big (2/3)")
-    data = apply_game_genie(data, "SZLIVO", "Always stay big (3/3)")
-    gg_applied = 4
-    print(f"  Applied {gg_applied} Game Genie codes")
 
-    # ================================================================
-    # Summary and write output
-    # ================================================================
-    print()
-    print("=" * 60)
-    print(f"Patches applied: {patches_applied}/5")
-    print(f"Patches failed:  {patches_failed}/5")
-    print(f"Game Genie codes: {gg_applied}/4")
+def patch_many(rom_paths, hash_rom=True, hash_output=False):
+    """Patch several ROM files in one process. Returns the number that failed."""
+    failures = 0
+    for number, rom_path in enumerate(rom_paths, 1):
+        if len(rom_paths) > 1:
+            if number > 1:
+                log()
+            log(f"[{number}/{len(rom_paths)}] {rom_path}")
+            log()
+            flush_log()
+        if not patch_file(rom_path, hash_rom=hash_rom, hash_output=hash_output):
+            failures += 1
+        flush_log()
+    return failures
 
-    if patches_applied == 0:
-        print("ERROR: No patches were applied! ROM may be incompatible.")
-        sys.exit(1)
 
-    if patches_failed > 0:
-        print(f"WARNING: {patches_failed} patch(es) failed. ROM may be partially patched.")
-
-    # Write patched ROM
-    with open(output_path, 'wb') as f:
-        f.write(data)
-
-    new_md5 = hashlib.md5(data).hexdigest()
-    print()
-    print(f"Original ROM: {os.path.basename(rom_path)}")
-    print(f"Patched ROM:  {os.path.basename(output_path)}")
-    print(f"New MD5: {new_md5}")
-    print()
-    print("What was changed:")
-    print("  - Pits are survivable (Mario bounces out with springboard velocity)")
-    print("  - Timer is frozen (no time pressure)")
-    print("  - Springboard always gives max boost (no precise timing needed)")
-    print("  - Castle mazes auto-corrected (Mario teleported to correct path in 4-4, 7-4, 8-4)")
-    print("  - Title screen skipped (gameplay starts automatically)")
-    print("  - Touching enemies powers you up (POAISA)")
-    print("  - Mario always stays big (OZTLLX + AATLGZ + SZLIVO)")
-    print()
-    print("Done! The patched ROM is ready to play.")
+def main():
+    parser = argparse.ArgumentParser(
+        description="Patch Super Mario Bros. (NES) for accessibility.",
+        epilog='Example:\n  python %(prog)s "Super Mario Bros. (World).nes"',
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rom_paths", nargs="+", metavar="rom_path",
+                        help="path to an original SMB1 .nes ROM (several may be given)")
+    parser.add_argument("--ips", metavar="PATH",
+                        help="write only the changes, as an IPS patch, instead of a patched ROM")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="also hash the patched ROM and print its MD5")
+    parser.add_argument("--no-hash", action="store_true",
+                        help="skip all MD5 hashing (overrides --verbose)")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="print only errors and warnings")
+    args = parser.parse_args()
+    if args.ips and len(args.rom_paths) > 1:
+        parser.error("--ips takes a single ROM")
+    set_quiet(args.quiet)
+
+    log("=" * 60)
+    log("Super Mario Bros. - Accessibility Patch")
+    log("=" * 60)
+    log()
+
+    hash_rom = not args.no_hash
+    hash_output = args.verbose and hash_rom
+    if args.ips:
+        failures = 0 if patch_file(args.rom_paths[0], args.ips, hash_rom, hash_output) else 1
+    else:
+        failures = patch_many(args.rom_paths, hash_rom, hash_output)
+    if failures:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        flush_log()